@@ -0,0 +1,517 @@
+"""
+Motor analítico em memória para as leituras RFID.
+
+As leituras são copiadas do banco em lotes para arrays colunares NumPy
+(zona, código do tipo, código do UID e timestamp em segundos desde a época)
+e as estatísticas são calculadas de forma vetorizada, sem materializar
+objetos ORM linha a linha.
+
+A sincronização é incremental pelo `id` da leitura: a cada consulta apenas
+as linhas com `id` maior que o último carregado são buscadas. Como a API não
+altera nem remove leituras, isso basta para manter as colunas em dia.
+
+Dias e horas seguem o relógio gravado em cada leitura, sem conversão de fuso:
+o gateway envia `datetime.now()`, ou seja, o horário local do Raspberry Pi.
+"""
+
+import sys
+import threading
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+TAMANHO_LOTE = 50_000
+CAPACIDADE_INICIAL = 1024
+SEGUNDOS_DIA = 86_400
+SEGUNDOS_HORA = 3_600
+# bincount só quando há no máximo este número de grupos por linha filtrada;
+# acima disso (ex.: uma data discrepante) usamos np.unique, que não aloca por grupo
+FATOR_BINCOUNT = 4
+
+
+def para_epoch(dt: datetime) -> int:
+    """
+    Converte o valor de relógio de um datetime para segundos desde a época.
+    O fuso de datetimes com tzinfo é descartado, como acontece ao gravar no
+    banco, para que filtros comparem com os valores como foram armazenados.
+    """
+    dt = dt.replace(tzinfo=None)
+    return int((dt - datetime(1970, 1, 1)).total_seconds())
+
+
+def _epoch_para_data(segundos: int) -> str:
+    return str(np.datetime64(int(segundos), "s").astype("datetime64[D]"))
+
+
+def _estatisticas(valores: np.ndarray) -> dict:
+    if valores.size == 0:
+        return {"quantidade": 0, "media": None, "mediana": None,
+                "p90": None, "minimo": None, "maximo": None}
+    p50, p90 = np.percentile(valores, [50, 90])
+    return {
+        "quantidade": int(valores.size),
+        "media": float(valores.mean()),
+        "mediana": float(p50),
+        "p90": float(p90),
+        "minimo": int(valores.min()),
+        "maximo": int(valores.max()),
+    }
+
+
+class _Dicionario:
+    """Tabela de internação: mapeia strings para códigos inteiros estáveis."""
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def __len__(self):
+        return len(self.valores)
+
+    def memoria(self) -> int:
+        return (sys.getsizeof(self._codigos) + sys.getsizeof(self.valores)
+                + sum(sys.getsizeof(v) for v in self.valores))
+
+    def codigo(self, valor: str) -> Optional[int]:
+        return self._codigos.get(valor)
+
+    def preparar(self, valores, dtype):
+        """
+        Códigos do lote sem alterar a tabela. Valores inéditos recebem os
+        próximos códigos e só passam a valer após `confirmar(novos)`; os que
+        não cabem em `dtype` recebem -1.
+        """
+        # Interna só os valores distintos do lote; o mapeamento por linha
+        # é feito com indexação vetorizada sobre o inverso do np.unique.
+        unicos, inverso = np.unique(np.asarray(valores, dtype=object).astype(str),
+                                    return_inverse=True)
+        limite = np.iinfo(dtype).max
+        codigos = np.empty(len(unicos), dtype=np.int64)
+        novos = []
+        for i, valor in enumerate(unicos.tolist()):
+            codigo = self._codigos.get(valor)
+            if codigo is None:
+                codigo = len(self.valores) + len(novos)
+                if codigo > limite:
+                    codigo = -1
+                else:
+                    novos.append(valor)
+            codigos[i] = codigo
+        return codigos[inverso.ravel()], novos
+
+    def confirmar(self, novos):
+        for valor in novos:
+            self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+
+
+class _Ordenacao:
+    """
+    Leituras ordenadas por (uid, timestamp): `ordem` são os índices das
+    linhas, `timestamps` os timestamps já nessa ordem e `por_uid` o tamanho
+    de cada grupo contíguo de um mesmo uid.
+    """
+
+    def __init__(self, ordem, timestamps, por_uid):
+        self.ordem = ordem
+        self.timestamps = timestamps
+        self.por_uid = por_uid
+
+    def __len__(self):
+        return len(self.ordem)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ordem.nbytes + self.timestamps.nbytes + self.por_uid.nbytes
+
+
+class _Visao:
+    """Fotografia imutável das colunas usada durante uma consulta."""
+
+    def __init__(self, zona, tipo, uid, timestamp, ordenacao=None):
+        self.zona = zona
+        self.tipo = tipo
+        self.uid = uid
+        self.timestamp = timestamp
+        self.ordenacao = ordenacao
+
+    def __len__(self):
+        return len(self.timestamp)
+
+
+class MotorAnalitico:
+
+    def __init__(self, capacidade_inicial: int = CAPACIDADE_INICIAL):
+        self.total = 0
+        self.ultimo_id = 0
+        self.descartadas = 0
+        self.pronto = False
+        self.tipos = _Dicionario()
+        self.uids = _Dicionario()
+        self._zona = np.empty(capacidade_inicial, dtype=np.int32)
+        self._tipo = np.empty(capacidade_inicial, dtype=np.uint8)
+        self._uid = np.empty(capacidade_inicial, dtype=np.int32)
+        self._timestamp = np.empty(capacidade_inicial, dtype=np.int64)
+        self._ordenacao = None
+        self._lock = threading.Lock()
+        self._lock_sync = threading.Lock()
+
+    # ===============================
+    # CARGA
+    # ===============================
+
+    def _garantir_capacidade(self, necessario: int):
+        capacidade = len(self._timestamp)
+        if necessario <= capacidade:
+            return
+        while capacidade < necessario:
+            capacidade *= 2
+        # Realoca em vez de redimensionar no lugar: visões já entregues a
+        # consultas em andamento continuam apontando para os arrays antigos.
+        for nome in ("_zona", "_tipo", "_uid", "_timestamp"):
+            antigo = getattr(self, nome)
+            novo = np.empty(capacidade, dtype=antigo.dtype)
+            novo[:self.total] = antigo[:self.total]
+            setattr(self, nome, novo)
+
+    def anexar(self, zonas, tipos, uids, timestamps):
+        """
+        Anexa um lote de leituras; `timestamps` em segundos desde a época.
+        Leituras cujo tipo ou UID excede o limite de valores distintos do
+        código (256 tipos, 2**31 UIDs) são descartadas e contadas.
+        Retorna quantas leituras foram anexadas.
+        """
+        if len(zonas) == 0:
+            return 0
+        zonas = np.asarray(zonas, dtype=np.int32)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        tipos = np.asarray(tipos, dtype=object)
+        uids = np.asarray(uids, dtype=object)
+        with self._lock:
+            codigos_tipo, novos_tipos = self.tipos.preparar(tipos, np.uint8)
+            validas = codigos_tipo >= 0
+            if not validas.all():
+                zonas, timestamps, uids = zonas[validas], timestamps[validas], uids[validas]
+                codigos_tipo = codigos_tipo[validas]
+            codigos_uid, novos_uids = self.uids.preparar(uids, np.int32)
+            validas_uid = codigos_uid >= 0
+            if not validas_uid.all():
+                zonas, timestamps = zonas[validas_uid], timestamps[validas_uid]
+                codigos_tipo, codigos_uid = codigos_tipo[validas_uid], codigos_uid[validas_uid]
+            self.descartadas += int((~validas).sum() + (~validas_uid).sum())
+
+            # Os dicionários só mudam depois que os dois lotes de códigos deram certo
+            self.tipos.confirmar(novos_tipos)
+            self.uids.confirmar(novos_uids)
+            n = len(zonas)
+            if n == 0:
+                return 0
+            self._garantir_capacidade(self.total + n)
+            fim = self.total + n
+            self._zona[self.total:fim] = zonas
+            self._tipo[self.total:fim] = codigos_tipo
+            self._uid[self.total:fim] = codigos_uid
+            self._timestamp[self.total:fim] = timestamps
+            self.total = fim
+        return n
+
+    def sincronizar(self, db, modelo, tamanho_lote: int = TAMANHO_LOTE, bloquear: bool = True) -> int:
+        """
+        Carrega do banco as leituras ainda não vistas e retorna quantas.
+        Com `bloquear=False`, retorna 0 de imediato se outra sincronização
+        já estiver em andamento, em vez de esperar por ela.
+        """
+        if not self._lock_sync.acquire(blocking=bloquear):
+            return 0
+        carregadas = 0
+        try:
+            while True:
+                linhas = db.query(
+                    modelo.id, modelo.zona, modelo.tipo_animal,
+                    modelo.uid, modelo.timestamp
+                ).filter(
+                    modelo.id > self.ultimo_id
+                ).order_by(modelo.id).limit(tamanho_lote).all()
+
+                if not linhas:
+                    break
+
+                ids, zonas, tipos, uids, datas = zip(*linhas)
+                datas = np.array(datas, dtype="datetime64[s]")
+                validas = ~np.isnat(datas)
+                if not validas.all():
+                    # Leituras sem timestamp não têm lugar nas estatísticas temporais
+                    with self._lock:
+                        self.descartadas += int((~validas).sum())
+                    zonas = np.asarray(zonas)[validas]
+                    tipos = np.asarray(tipos, dtype=object)[validas]
+                    uids = np.asarray(uids, dtype=object)[validas]
+                    datas = datas[validas]
+                carregadas += self.anexar(zonas, tipos, uids, datas.astype(np.int64))
+                self.ultimo_id = ids[-1]
+
+                if len(linhas) < tamanho_lote:
+                    break
+            self.pronto = True
+        finally:
+            self._lock_sync.release()
+        return carregadas
+
+    # ===============================
+    # CONSULTAS
+    # ===============================
+
+    def _visao(self, com_ordem: bool = False) -> _Visao:
+        with self._lock:
+            n = self.total
+            zona, tipo = self._zona[:n], self._tipo[:n]
+            uid, timestamp = self._uid[:n], self._timestamp[:n]
+            ordenacao = self._ordenacao
+        if com_ordem and (ordenacao is None or len(ordenacao) != n):
+            ordenacao = self._ordenar(uid, timestamp, ordenacao)
+            with self._lock:
+                atual = self._ordenacao
+                if atual is None or len(atual) < n:
+                    self._ordenacao = ordenacao
+        return _Visao(zona, tipo, uid, timestamp, ordenacao)
+
+    @staticmethod
+    def _ordenar(uid: np.ndarray, timestamp: np.ndarray, anterior: Optional[_Ordenacao]) -> _Ordenacao:
+        """
+        Ordena as leituras por (uid, timestamp). Quando já existe a ordenação
+        de um prefixo das colunas, só as linhas novas são ordenadas e
+        intercaladas nela, sem reconstruir nem reindexar as linhas antigas.
+        """
+        indice = np.int32 if len(uid) < 2**31 else np.int64
+        if anterior is None:
+            if len(uid) == 0:
+                return _Ordenacao(np.empty(0, dtype=indice), timestamp[:0], np.zeros(0, dtype=np.int64))
+            # Chave única uid * amplitude + (timestamp - mínimo) quando cabe em
+            # int64: um argsort é bem mais rápido que o lexsort de duas colunas.
+            t_min = int(timestamp.min())
+            amplitude = int(timestamp.max()) - t_min + 1
+            if (int(uid.max()) + 1) * amplitude < 2**63:
+                chave = uid.astype(np.int64) * amplitude + (timestamp - t_min)
+                ordem = np.argsort(chave, kind="stable").astype(indice)
+                del chave
+            else:
+                ordem = np.lexsort((timestamp, uid)).astype(indice)
+            por_uid = np.bincount(uid, minlength=int(uid.max()) + 1)
+            return _Ordenacao(ordem, timestamp[ordem], por_uid)
+
+        m = len(anterior)
+        ordem_novas = np.lexsort((timestamp[m:], uid[m:]))
+        novas = (m + ordem_novas).astype(indice)
+        uids_novos, ts_novos = uid[m:][ordem_novas], timestamp[m:][ordem_novas]
+
+        n_uids = max(len(anterior.por_uid), int(uids_novos.max()) + 1)
+        por_uid = np.zeros(n_uids, dtype=np.int64)
+        por_uid[:len(anterior.por_uid)] = anterior.por_uid
+        fim_grupo = np.cumsum(por_uid)
+        inicio_grupo = fim_grupo - por_uid
+
+        # Um searchsorted por uid presente no lote novo, restrito ao grupo
+        # desse uid na ordenação anterior (já ordenado por timestamp).
+        posicoes = np.empty(len(novas), dtype=np.int64)
+        limites = np.flatnonzero(np.r_[True, uids_novos[1:] != uids_novos[:-1], True]).tolist()
+        for a, b in zip(limites[:-1], limites[1:]):
+            u = uids_novos[a]
+            lo, hi = inicio_grupo[u], fim_grupo[u]
+            posicoes[a:b] = lo + np.searchsorted(anterior.timestamps[lo:hi], ts_novos[a:b], side="right")
+
+        por_uid += np.bincount(uids_novos, minlength=n_uids)
+        return _Ordenacao(
+            np.insert(anterior.ordem, posicoes, novas),
+            np.insert(anterior.timestamps, posicoes, ts_novos),
+            por_uid,
+        )
+
+    def _filtro(
+        self,
+        visao: _Visao,
+        zona: Optional[int] = None,
+        tipo_animal: Optional[str] = None,
+        uid: Optional[str] = None,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+    ) -> Optional[np.ndarray]:
+        """Máscara booleana dos filtros, ou None quando não há filtro."""
+        mascara = None
+
+        def aplicar(condicao):
+            nonlocal mascara
+            mascara = condicao if mascara is None else mascara & condicao
+
+        if zona is not None:
+            aplicar(visao.zona == zona)
+        if tipo_animal is not None:
+            codigo = self.tipos.codigo(tipo_animal)
+            aplicar(visao.tipo == codigo if codigo is not None else np.zeros(len(visao), dtype=bool))
+        if uid is not None:
+            codigo = self.uids.codigo(uid)
+            aplicar(visao.uid == codigo if codigo is not None else np.zeros(len(visao), dtype=bool))
+        if inicio is not None:
+            aplicar(visao.timestamp >= para_epoch(inicio))
+        if fim is not None:
+            aplicar(visao.timestamp < para_epoch(fim))
+        return mascara
+
+    def resumo(self) -> dict:
+        visao = self._visao()
+        with self._lock:
+            colunas = (self._zona, self._tipo, self._uid, self._timestamp)
+            ordenacao = self._ordenacao
+        bytes_linha = sum(a.itemsize for a in colunas)
+        memoria_alocada = sum(a.nbytes for a in colunas)
+        memoria_ordenacao = ordenacao.nbytes if ordenacao is not None else 0
+        memoria_dicionarios = self.tipos.memoria() + self.uids.memoria()
+        return {
+            "total_leituras": len(visao),
+            "ultimo_id": self.ultimo_id,
+            "descartadas": self.descartadas,
+            "animais": len(self.uids),
+            "tipos": list(self.tipos.valores),
+            "memoria_colunas_bytes": len(visao) * bytes_linha,
+            "memoria_alocada_bytes": memoria_alocada,
+            "memoria_ordenacao_bytes": memoria_ordenacao,
+            "memoria_dicionarios_bytes": memoria_dicionarios,
+            "memoria_total_bytes": memoria_alocada + memoria_ordenacao + memoria_dicionarios,
+            "inicio": _epoch_para_data(visao.timestamp.min()) if len(visao) else None,
+            "fim": _epoch_para_data(visao.timestamp.max()) if len(visao) else None,
+        }
+
+    def visitas_por_dia(self, uid: Optional[str] = None, limit: int = 100, **filtros) -> dict:
+        """
+        Com `uid`, leituras do animal em cada dia. Sem `uid`, um resumo
+        por animal: total de leituras, dias com leitura, média e máximo diário.
+        """
+        if limit < 1:
+            raise ValueError("limit deve ser maior ou igual a 1")
+        visao = self._visao()
+        mascara = self._filtro(visao, uid=uid, **filtros)
+        dias = visao.timestamp // SEGUNDOS_DIA
+        uids = visao.uid
+        if mascara is not None:
+            dias, uids = dias[mascara], uids[mascara]
+
+        if uid is not None:
+            unicos, contagens = np.unique(dias, return_counts=True)
+            return {
+                "uid": uid,
+                "dias": [
+                    {"data": _epoch_para_data(dia * SEGUNDOS_DIA), "visitas": int(c)}
+                    for dia, c in zip(unicos.tolist(), contagens.tolist())
+                ],
+            }
+
+        if dias.size == 0:
+            return {"total_animais": 0, "animais": []}
+
+        # Chave única (animal, dia) para contar visitas por dia sem laços Python.
+        n_uids = len(self.uids)
+        dia_min = dias.min()
+        n_dias = int(dias.max() - dia_min) + 1
+        chaves = uids.astype(np.int64) * n_dias + (dias - dia_min)
+        if n_uids * n_dias <= FATOR_BINCOUNT * chaves.size:
+            por_chave = np.bincount(chaves, minlength=n_uids * n_dias)
+            chaves_unicas = np.flatnonzero(por_chave)
+            por_dia = por_chave[chaves_unicas]
+        else:
+            chaves_unicas, por_dia = np.unique(chaves, return_counts=True)
+        animal_da_chave = chaves_unicas // n_dias
+
+        total = np.bincount(uids, minlength=n_uids)
+        dias_ativos = np.bincount(animal_da_chave, minlength=n_uids)
+        maximo = np.zeros(n_uids, dtype=np.int64)
+        np.maximum.at(maximo, animal_da_chave, por_dia)
+
+        presentes = np.flatnonzero(dias_ativos)
+        ordenados = presentes[np.argsort(-total[presentes], kind="stable")][:limit]
+        return {
+            "total_animais": int(presentes.size),
+            "animais": [
+                {
+                    "uid": self.uids.valores[i],
+                    "total_visitas": int(total[i]),
+                    "dias_com_visita": int(dias_ativos[i]),
+                    "media_visitas_dia": float(total[i] / dias_ativos[i]),
+                    "max_visitas_dia": int(maximo[i]),
+                }
+                for i in ordenados.tolist()
+            ],
+        }
+
+    def horarios_pico(self, **filtros) -> dict:
+        """Histograma de leituras por hora do dia em cada zona."""
+        visao = self._visao()
+        mascara = self._filtro(visao, **filtros)
+        zonas, timestamps = visao.zona, visao.timestamp
+        if mascara is not None:
+            zonas, timestamps = zonas[mascara], timestamps[mascara]
+
+        if zonas.size == 0:
+            return {}
+
+        horas = (timestamps // SEGUNDOS_HORA) % 24
+        zona_min = int(zonas.min())
+        n_zonas = int(zonas.max()) - zona_min + 1
+        if n_zonas * 24 <= FATOR_BINCOUNT * zonas.size:
+            indice_zona = zonas - zona_min
+            zonas_unicas = np.arange(zona_min, zona_min + n_zonas)
+        else:
+            zonas_unicas, indice_zona = np.unique(zonas, return_inverse=True)
+            indice_zona = indice_zona.ravel()
+        histograma = np.bincount(
+            indice_zona.astype(np.int64) * 24 + horas, minlength=len(zonas_unicas) * 24
+        ).reshape(len(zonas_unicas), 24)
+        presentes = histograma.sum(axis=1) > 0
+        zonas_unicas, histograma = zonas_unicas[presentes], histograma[presentes]
+
+        resultado = {}
+        for zona, por_hora in zip(zonas_unicas.tolist(), histograma):
+            hora_pico = int(por_hora.argmax())
+            resultado[f"zona_{zona}"] = {
+                "hora_pico": hora_pico,
+                "leituras_hora_pico": int(por_hora[hora_pico]),
+                "por_hora": por_hora.tolist(),
+            }
+        return resultado
+
+    def intervalos_entre_leituras(self, limit: int = 100, **filtros) -> dict:
+        """Tempo em segundos entre leituras consecutivas do mesmo animal."""
+        if limit < 1:
+            raise ValueError("limit deve ser maior ou igual a 1")
+        visao = self._visao(com_ordem=True)
+        mascara = self._filtro(visao, **filtros)
+        ordenacao = visao.ordenacao
+        timestamps = ordenacao.timestamps
+        uids = np.repeat(np.arange(len(ordenacao.por_uid), dtype=np.int32), ordenacao.por_uid)
+        if mascara is not None:
+            # Filtrar uma ordenação já pronta preserva a ordem (uid, timestamp).
+            selecionadas = mascara[ordenacao.ordem]
+            uids, timestamps = uids[selecionadas], timestamps[selecionadas]
+
+        mesmo_animal = uids[1:] == uids[:-1]
+        intervalos = np.diff(timestamps)[mesmo_animal]
+        animal_do_intervalo = uids[1:][mesmo_animal]
+
+        por_animal = []
+        if intervalos.size:
+            # Intervalos já estão agrupados por animal: reduzimos por segmento.
+            inicios = np.flatnonzero(np.r_[True, animal_do_intervalo[1:] != animal_do_intervalo[:-1]])
+            contagens = np.diff(np.r_[inicios, intervalos.size])
+            somas = np.add.reduceat(intervalos, inicios)
+            maximos = np.maximum.reduceat(intervalos, inicios)
+            minimos = np.minimum.reduceat(intervalos, inicios)
+            animais = animal_do_intervalo[inicios]
+            for j in np.argsort(-contagens, kind="stable")[:limit].tolist():
+                por_animal.append({
+                    "uid": self.uids.valores[animais[j]],
+                    "quantidade": int(contagens[j]),
+                    "media": float(somas[j] / contagens[j]),
+                    "minimo": int(minimos[j]),
+                    "maximo": int(maximos[j]),
+                })
+
+        return {"geral": _estatisticas(intervalos), "animais": por_animal}
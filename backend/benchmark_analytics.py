@@ -0,0 +1,155 @@
+"""
+Benchmark do motor analítico com leituras sintéticas.
+
+Uso:
+    python benchmark_analytics.py [linhas] [--sqlite caminho.db]
+
+Sem `--sqlite`, as leituras são anexadas direto em memória. Com `--sqlite`,
+o arquivo é populado (uma vez; execuções seguintes o reaproveitam) e a carga
+é feita por `sincronizar`, o mesmo caminho usado pela API. Rode a partir de
+`backend/`.
+"""
+
+import resource
+import statistics
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from analytics import MotorAnalitico, TAMANHO_LOTE
+from models import Leitura
+
+ZONAS = 2
+ANIMAIS = 500
+DIAS = 365
+INICIO = 1_704_067_200  # 2024-01-01T00:00:00
+NOVAS_POR_CICLO = 1_000
+CICLOS = 10
+
+
+def gerar_lote(rng, n, inicio=INICIO, dias=DIAS):
+    uid_idx = rng.integers(0, ANIMAIS, n)
+    zonas = rng.integers(1, ZONAS + 1, n)
+    tipos = np.where(uid_idx % 3 == 0, "OVELINHA", "VAQUINHA")
+    uids = np.char.add("UID", uid_idx.astype(str))
+    timestamps = inicio + rng.integers(0, dias * 86_400, n)
+    return zonas, tipos, uids, timestamps
+
+
+def inserir_banco(engine, rng, n, **kwargs):
+    zonas, tipos, uids, timestamps = gerar_lote(rng, n, **kwargs)
+    # Mesmo formato de texto que o SQLAlchemy grava para DateTime no SQLite
+    datas = np.char.replace(np.datetime_as_string(timestamps.astype("datetime64[s]")), "T", " ")
+    linhas = list(zip(zonas.tolist(), tipos.tolist(), uids.tolist(), [0] * n, datas.tolist()))
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO leituras (zona, tipo_animal, uid, count, timestamp) VALUES (?, ?, ?, ?, ?)",
+            linhas,
+        )
+
+
+def preparar_banco(caminho, linhas, rng):
+    engine = create_engine(f"sqlite:///{caminho}")
+    Leitura.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        existentes = conn.execute(select(func.count()).select_from(Leitura.__table__)).scalar()
+    if existentes < linhas:
+        t0 = time.perf_counter()
+        restantes = linhas - existentes
+        while restantes > 0:
+            n = min(500_000, restantes)
+            inserir_banco(engine, rng, n)
+            restantes -= n
+        print(f"Banco populado com {linhas - existentes:,} leituras em {time.perf_counter() - t0:.1f} s")
+    return engine
+
+
+def medir(nome, funcao, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - t0)
+    print(f"{nome:<40} melhor {min(tempos) * 1000:9.1f} ms   primeira {tempos[0] * 1000:9.1f} ms")
+
+
+def mib(n):
+    return f"{n / 2**20:.1f} MiB"
+
+
+def main():
+    argumentos = sys.argv[1:]
+    caminho = None
+    if "--sqlite" in argumentos:
+        i = argumentos.index("--sqlite")
+        caminho = argumentos[i + 1]
+        del argumentos[i:i + 2]
+    linhas = int(argumentos[0]) if argumentos else 10_000_000
+    rng = np.random.default_rng(42)
+    motor = MotorAnalitico()
+
+    if caminho:
+        engine = preparar_banco(caminho, linhas, rng)
+        Sessao = sessionmaker(bind=engine)
+        db = Sessao()
+        t0 = time.perf_counter()
+        motor.sincronizar(db, Leitura)
+        carga = time.perf_counter() - t0
+        print(f"Carga inicial via sincronizar (SQLite, lotes de {TAMANHO_LOTE:,}): {carga:.1f} s")
+    else:
+        t0 = time.perf_counter()
+        restantes = linhas
+        while restantes > 0:
+            n = min(TAMANHO_LOTE, restantes)
+            motor.anexar(*gerar_lote(rng, n))
+            restantes -= n
+        carga = time.perf_counter() - t0
+        print(f"Carga via anexar em lotes de {TAMANHO_LOTE:,}: {carga:.1f} s (inclui geração sintética)")
+
+    print()
+    medir("resumo", motor.resumo)
+    medir("visitas por dia (todos os animais)", motor.visitas_por_dia)
+    medir("visitas por dia (uid=UID7)", lambda: motor.visitas_por_dia(uid="UID7"))
+    medir("horários de pico", motor.horarios_pico)
+    medir("horários de pico (zona=1)", lambda: motor.horarios_pico(zona=1))
+    medir("intervalos entre leituras", motor.intervalos_entre_leituras)
+    medir("intervalos (tipo=OVELINHA)", lambda: motor.intervalos_entre_leituras(tipo_animal="OVELINHA"))
+
+    # Regime permanente: leituras chegam entre uma consulta e outra, então
+    # cada /intervalos precisa intercalar as novas na ordenação em cache.
+    inicio_novas = INICIO + DIAS * 86_400
+    sincronizacoes, consultas = [], []
+    for ciclo in range(CICLOS):
+        t0 = time.perf_counter()
+        if caminho:
+            inserir_banco(engine, rng, NOVAS_POR_CICLO, inicio=inicio_novas + ciclo * 3_600, dias=1)
+            t0 = time.perf_counter()
+            motor.sincronizar(db, Leitura)
+        else:
+            motor.anexar(*gerar_lote(rng, NOVAS_POR_CICLO, inicio=inicio_novas + ciclo * 3_600, dias=1))
+        sincronizacoes.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        motor.intervalos_entre_leituras()
+        consultas.append(time.perf_counter() - t0)
+    print(f"\nRegime permanente ({CICLOS} ciclos de {NOVAS_POR_CICLO:,} leituras novas + /intervalos):")
+    print(f"{'  carga das novas':<40} mediana {statistics.median(sincronizacoes) * 1000:8.1f} ms")
+    print(f"{'  intervalos (intercala)':<40} mediana {statistics.median(consultas) * 1000:8.1f} ms"
+          f"   pior {max(consultas) * 1000:8.1f} ms")
+
+    resumo = motor.resumo()
+    print(f"\nLinhas: {resumo['total_leituras']:,}  Animais: {resumo['animais']}")
+    print(f"Memória das colunas:     {mib(resumo['memoria_colunas_bytes'])} "
+          f"({resumo['memoria_colunas_bytes'] / resumo['total_leituras']:.0f} B/linha)")
+    print(f"Colunas alocadas:        {mib(resumo['memoria_alocada_bytes'])} (capacidade dobra ao crescer)")
+    print(f"Ordenação (uid, tempo):  {mib(resumo['memoria_ordenacao_bytes'])}")
+    print(f"Dicionários:             {mib(resumo['memoria_dicionarios_bytes'])}")
+    print(f"Total do motor:          {mib(resumo['memoria_total_bytes'])} "
+          f"({resumo['memoria_total_bytes'] / resumo['total_leituras']:.0f} B/linha)")
+    print(f"Pico de RSS do processo: {mib(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime
+
+Base = declarative_base()
+
+
+class Usuario(Base):
+    __tablename__ = "usuarios"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, index=True, nullable=False)
+    senha_hash = Column(String, nullable=False)
+    nome_completo = Column(String)
+    email = Column(String, unique=True)
+    criado_em = Column(DateTime, default=datetime.utcnow)
+    ativo = Column(Integer, default=1)  # SQLite usa Integer para Boolean
+
+
+class Leitura(Base):
+    __tablename__ = "leituras"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    zona = Column(Integer, nullable=False, index=True)
+    tipo_animal = Column(String, nullable=False, index=True)
+    uid = Column(String, nullable=False)
+    count = Column(Integer)
+    arduino = Column(String)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
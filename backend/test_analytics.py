@@ -0,0 +1,185 @@
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+# O app cria o banco ao ser importado: aponta para um arquivo temporário
+_BANCO = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+_BANCO.close()
+os.environ["DATABASE_URL"] = f"sqlite:///{_BANCO.name}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as api  # noqa: E402
+from analytics import MotorAnalitico  # noqa: E402
+from models import Leitura  # noqa: E402
+
+
+# ===============================
+# REFERÊNCIA EM PYTHON PURO
+# ===============================
+
+def ref_intervalos(linhas):
+    por_animal = defaultdict(list)
+    for _, _, uid, ts in linhas:
+        por_animal[uid].append(ts)
+    todos, animais = [], {}
+    for uid, tempos in por_animal.items():
+        tempos.sort()
+        difs = [b - a for a, b in zip(tempos, tempos[1:])]
+        todos += difs
+        if difs:
+            animais[uid] = (len(difs), sum(difs) / len(difs), min(difs), max(difs))
+    return sorted(todos), animais
+
+
+def ref_visitas(linhas):
+    por_dia = Counter((uid, ts // 86_400) for _, _, uid, ts in linhas)
+    animais = defaultdict(list)
+    for (uid, _), n in por_dia.items():
+        animais[uid].append(n)
+    return {uid: (sum(v), len(v), max(v)) for uid, v in animais.items()}
+
+
+def ref_horarios(linhas):
+    histogramas = defaultdict(lambda: [0] * 24)
+    for zona, _, _, ts in linhas:
+        histogramas[zona][(ts // 3_600) % 24] += 1
+    return {f"zona_{z}": h for z, h in histogramas.items()}
+
+
+def conferir(motor, linhas):
+    todos, animais = ref_intervalos(linhas)
+    resultado = motor.intervalos_entre_leituras(limit=10_000)
+    assert resultado["geral"]["quantidade"] == len(todos)
+    if todos:
+        assert resultado["geral"]["minimo"] == todos[0]
+        assert resultado["geral"]["maximo"] == todos[-1]
+        assert resultado["geral"]["media"] == pytest.approx(sum(todos) / len(todos))
+        assert resultado["geral"]["mediana"] == pytest.approx(float(np.median(todos)))
+    assert {a["uid"]: (a["quantidade"], pytest.approx(a["media"]), a["minimo"], a["maximo"])
+            for a in resultado["animais"]} == animais
+
+    visitas = motor.visitas_por_dia(limit=10_000)
+    assert {a["uid"]: (a["total_visitas"], a["dias_com_visita"], a["max_visitas_dia"])
+            for a in visitas["animais"]} == ref_visitas(linhas)
+
+    assert motor.horarios_pico() == {
+        zona: {"hora_pico": h.index(max(h)), "leituras_hora_pico": max(h), "por_hora": h}
+        for zona, h in ref_horarios(linhas).items()
+    }
+
+
+# ===============================
+# MOTOR
+# ===============================
+
+@pytest.mark.parametrize("semente,t_min,t_max", [
+    (1, 1_700_000_000, 1_700_000_000 + 30 * 86_400),  # mês contínuo: caminho bincount
+    (2, -5_000_000_000, 9_000_000_000),  # antes de 1970 e depois de 2106: caminho np.unique
+    (3, -86_400 * 3, 86_400 * 3),  # em torno da época
+])
+def test_estatisticas_conferem_com_referencia_em_varias_cargas(semente, t_min, t_max):
+    rng = np.random.default_rng(semente)
+    motor = MotorAnalitico(capacidade_inicial=8)
+    linhas = []
+    for _ in range(8):
+        n = int(rng.integers(1, 400))
+        lote = [
+            (int(rng.choice([1, 2, 7])), "VAQUINHA", f"U{rng.integers(0, 15)}", int(rng.integers(t_min, t_max)))
+            for _ in range(n)
+        ]
+        motor.anexar(*zip(*lote))
+        linhas += lote
+        conferir(motor, linhas)
+
+
+def test_filtros_aplicam_sobre_a_ordenacao_em_cache():
+    motor = MotorAnalitico()
+    linhas = [(1, "VAQUINHA", "A", 0), (2, "VAQUINHA", "A", 10), (1, "OVELINHA", "A", 30),
+              (1, "VAQUINHA", "A", 100), (1, "VAQUINHA", "B", -50)]
+    motor.anexar(*zip(*linhas))
+    motor.intervalos_entre_leituras()
+
+    assert motor.intervalos_entre_leituras(zona=1)["geral"]["quantidade"] == 2
+    assert motor.intervalos_entre_leituras(tipo_animal="VAQUINHA", uid="A")["geral"]["minimo"] == 10
+    assert motor.intervalos_entre_leituras(tipo_animal="INEXISTENTE")["geral"]["quantidade"] == 0
+    assert motor.intervalos_entre_leituras(inicio=datetime(1970, 1, 1, 0, 0, 5))["geral"]["quantidade"] == 2
+
+
+def test_limite_de_tipos_descarta_leituras_sem_corromper_dicionarios():
+    motor = MotorAnalitico()
+    assert motor.anexar([1] * 256, [f"T{i}" for i in range(256)], ["A"] * 256, range(256)) == 256
+    assert motor.anexar([1, 1], ["T0", "EXCEDENTE"], ["A", "NOVO"], [500, 600]) == 1
+
+    assert motor.descartadas == 1
+    assert len(motor.tipos) == 256
+    assert motor.uids.codigo("NOVO") is None
+    assert motor.resumo()["total_leituras"] == 257
+
+
+def test_limit_invalido():
+    with pytest.raises(ValueError):
+        MotorAnalitico().visitas_por_dia(limit=0)
+
+
+# ===============================
+# API
+# ===============================
+
+@pytest.fixture(scope="module")
+def cliente():
+    db = api.SessionLocal()
+    inicio = datetime(2025, 1, 1, 8)
+    for i in range(6):
+        db.add(Leitura(zona=1, tipo_animal="VAQUINHA", uid=f"U{i % 2}", count=i,
+                       timestamp=inicio + timedelta(hours=i)))
+    db.add(Leitura(zona=2, tipo_animal="OVELINHA", uid="U9", count=0))
+    db.commit()
+    db.execute(Leitura.__table__.insert().values(zona=1, tipo_animal="VAQUINHA", uid="U3", timestamp=None))
+    db.commit()
+    db.close()
+
+    with TestClient(api.app) as cliente:
+        for _ in range(100):
+            if api.motor_analitico.pronto:
+                break
+            time.sleep(0.05)
+        yield cliente
+
+
+@pytest.fixture
+def cabecalhos():
+    token = api.create_access_token({"sub": "admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_endpoints_de_analytics(cliente, cabecalhos):
+    resumo = cliente.get("/api/analytics/resumo", headers=cabecalhos)
+    assert resumo.status_code == 200
+    assert resumo.json()["total_leituras"] == 7
+    assert resumo.json()["descartadas"] == 1
+
+    intervalos = cliente.get("/api/analytics/intervalos?zona=1", headers=cabecalhos).json()
+    assert intervalos["geral"]["quantidade"] == 4
+    assert intervalos["geral"]["minimo"] == 7_200
+
+    for rota in ("visitas", "horarios-pico"):
+        assert cliente.get(f"/api/analytics/{rota}", headers=cabecalhos).status_code == 200
+
+
+def test_limit_zero_retorna_422(cliente, cabecalhos):
+    assert cliente.get("/api/analytics/visitas?limit=0", headers=cabecalhos).status_code == 422
+    assert cliente.get("/api/analytics/intervalos?limit=0", headers=cabecalhos).status_code == 422
+
+
+def test_retorna_503_durante_carga_inicial(cliente, cabecalhos, monkeypatch):
+    motor = MotorAnalitico()
+    monkeypatch.setattr(api, "motor_analitico", motor)
+    with motor._lock_sync:
+        resposta = cliente.get("/api/analytics/resumo", headers=cabecalhos)
+    assert resposta.status_code == 503